@@ -1,11 +1,21 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+from collections import OrderedDict
 from openai import AsyncOpenAI
 import os
+import json
+import asyncio
+import hashlib
+import pickle
+import threading
+import time
 from dotenv import load_dotenv
-import chromadb
+import faiss
+import numpy as np
+from rank_bm25 import BM25Okapi
 from pathlib import Path
 
 load_dotenv()
@@ -28,14 +38,115 @@ app.add_middleware(
 # Initialize OpenAI async client
 client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
 
-# Initialize Chroma client
-chroma_db_path = Path(__file__).parent.parent / 'chroma_db'
-chroma_client = chromadb.PersistentClient(path=str(chroma_db_path))
+# Cache embeddings of recent questions so repeated questions skip the API call.
+# Keys are SHA-256 digests so long messages don't stay in memory as keys.
+# functools.lru_cache cannot wrap a coroutine, so the LRU is kept by hand; it is
+# only touched from the event loop thread, so no lock is needed.
+QUERY_EMBED_CACHE_SIZE = 1024
+_query_embed_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+
+async def get_question_embedding(text: str) -> List[float]:
+    """
+    Return the embedding for a question, using the in-memory LRU cache when possible.
+    """
+    key = hashlib.sha256(text.encode()).hexdigest()
+    if key in _query_embed_cache:
+        _query_embed_cache.move_to_end(key)
+        return _query_embed_cache[key]
+    
+    embedding_response = await client.embeddings.create(
+        model="text-embedding-3-small",
+        input=text
+    )
+    embedding = embedding_response.data[0].embedding
+    
+    _query_embed_cache[key] = embedding
+    if len(_query_embed_cache) > QUERY_EMBED_CACHE_SIZE:
+        _query_embed_cache.popitem(last=False)
+    return embedding
+
+# Number of chunks injected into the prompt, and number of candidates each
+# retriever (semantic and keyword) contributes before fusion and reranking
+CONTEXT_CHUNKS = 5
+RETRIEVAL_CANDIDATES = 30
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms for keyword search."""
+    return text.lower().split()
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[int]:
+    """
+    Merge several ranked lists of chunk indices into one, best first.
+    Each chunk scores sum(1 / (k + rank)) over the lists it appears in.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking):
+            scores[idx] = scores.get(idx, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+# Load the cross-encoder used to rerank retrieved candidates
 try:
-    chroma_collection = chroma_client.get_collection(name="onenote_chunks")
-except:
-    # Collection doesn't exist yet - that's okay
-    chroma_collection = None
+    from sentence_transformers import CrossEncoder
+    reranker = CrossEncoder("BAAI/bge-reranker-base", max_length=512)
+except Exception:
+    # Reranker unavailable - that's okay, the fused ranking is used as is
+    reranker = None
+
+# FAISS index exported by the OneNote pipeline. It is loaded lazily and
+# re-checked periodically, so an index built or rebuilt while the server is
+# running becomes searchable without a restart.
+faiss_index_path = Path(__file__).parent.parent / 'faiss_index'
+INDEX_RECHECK_SECONDS = 5
+_index_lock = threading.Lock()
+_index_cache = {"obj": None, "mtime": None, "checked": 0.0}
+
+def load_search_index() -> dict:
+    """
+    Load the FAISS index, its chunk metadata and a BM25 index over the same chunks.
+    """
+    ivf_path = faiss_index_path / 'onenote.ivf'
+    if ivf_path.exists():
+        # Large corpora: memory-map the IVF index so clusters are paged in on demand
+        index = faiss.read_index(str(ivf_path), faiss.IO_FLAG_MMAP)
+        index.nprobe = 8
+    else:
+        index = faiss.read_index(str(faiss_index_path / 'onenote.faiss'))
+        index.hnsw.efSearch = 64
+    # Chunk texts and metadata, parallel to the index rows
+    with open(faiss_index_path / 'onenote_meta.pkl', 'rb') as f:
+        metadata = pickle.load(f)
+    return {
+        'faiss': index,
+        'metadata': metadata,
+        # Keyword index over the same chunks, for hybrid retrieval
+        'bm25': BM25Okapi([tokenize(doc) for doc in metadata['documents']])
+    }
+
+def get_search_index() -> Optional[dict]:
+    """
+    Return the loaded search index, or None if the pipeline hasn't built one yet.
+    
+    At most every INDEX_RECHECK_SECONDS, the metadata file's modification time is
+    checked and the index reloaded if it changed. The pipeline writes that file
+    last, so a new mtime means a complete index.
+    """
+    with _index_lock:
+        now = time.time()
+        if now - _index_cache["checked"] > INDEX_RECHECK_SECONDS:
+            _index_cache["checked"] = now
+            try:
+                mtime = (faiss_index_path / 'onenote_meta.pkl').stat().st_mtime
+                if mtime != _index_cache["mtime"]:
+                    _index_cache["obj"] = load_search_index()
+                    _index_cache["mtime"] = mtime
+            except Exception:
+                # Index doesn't exist yet (or is mid-rebuild) - keep what we have
+                pass
+        return _index_cache["obj"]
+
+# Load at startup so the first request doesn't pay for it
+get_search_index()
 
 # Pydantic models
 class Message(BaseModel):
@@ -59,19 +170,95 @@ class ContextChunk(BaseModel):
     source_file: str
     heading: str
 
-class RagChatResponse(BaseModel):
-    message: str
-    usage: UsageInfo
-    context_chunks: List[ContextChunk]
-
 class HealthResponse(BaseModel):
     status: str
 
-@app.post('/api/chat', response_model=RagChatResponse)
+async def retrieve_context(user_message: str, search_index: dict):
+    """
+    Find the chunks most relevant to a question with hybrid semantic + keyword
+    search, reranked when a reranker is available.
+    
+    Args:
+        user_message: The question to retrieve context for
+        search_index: Loaded search index, as returned by get_search_index()
+    
+    Returns:
+        Tuple of (list of ContextChunk, context text for the system prompt)
+    """
+    faiss_index = search_index['faiss']
+    index_metadata = search_index['metadata']
+    bm25 = search_index['bm25']
+    
+    # Generate embedding for the user's question while the
+    # keyword search runs in a worker thread
+    embedding_task = asyncio.create_task(get_question_embedding(user_message))
+    try:
+        keyword_scores = await asyncio.to_thread(bm25.get_scores, tokenize(user_message))
+    except BaseException:
+        embedding_task.cancel()
+        raise
+    
+    try:
+        question_embedding = await embedding_task
+    except Exception as e:
+        # If the embeddings API fails, continue with keyword hits only
+        print(f"Question embedding failed: {str(e)}")
+        semantic_hits = []
+    else:
+        # Search the index for similar chunks (cosine similarity on normalized vectors)
+        query = np.asarray([question_embedding], dtype=np.float32)
+        faiss.normalize_L2(query)
+        _, indices = faiss_index.search(query, RETRIEVAL_CANDIDATES)
+        # FAISS pads missing results with -1
+        semantic_hits = [int(idx) for idx in indices[0] if idx >= 0]
+    
+    # BM25 scores 0 for no term overlap
+    keyword_hits = [
+        int(idx) for idx in np.argsort(-keyword_scores)[:RETRIEVAL_CANDIDATES]
+        if keyword_scores[idx] > 0
+    ]
+    
+    # Combine both rankings
+    candidates = reciprocal_rank_fusion([semantic_hits, keyword_hits])[:RETRIEVAL_CANDIDATES]
+    
+    # Rerank the candidates by scoring each (question, chunk) pair jointly
+    if reranker is not None and candidates:
+        rerank_scores = await asyncio.to_thread(
+            reranker.predict,
+            [(user_message, index_metadata['documents'][idx]) for idx in candidates]
+        )
+        candidates = [candidates[i] for i in np.argsort(-rerank_scores)]
+    
+    # Extract context chunks
+    context_chunks = []
+    context_text = ""
+    for i, idx in enumerate(candidates[:CONTEXT_CHUNKS]):
+        doc = index_metadata['documents'][idx]
+        metadata = index_metadata['metadatas'][idx] or {}
+        context_chunks.append(ContextChunk(
+            text=doc,
+            source_file=metadata.get('source_file', 'Unknown'),
+            heading=metadata.get('heading', 'No heading')
+        ))
+        context_text += f"\n\n--- Context {i+1} ---\n{doc}"
+    
+    return context_chunks, context_text
+
+def sse_event(data: dict) -> str:
+    """Format a payload as a Server-Sent Events message."""
+    return f"data: {json.dumps(data)}\n\n"
+
+@app.post('/api/chat')
 async def chat(request: ChatRequest):
     """
     Chat endpoint with RAG (Retrieval-Augmented Generation).
-    Queries Chroma for relevant context when available, otherwise falls back to standard chat.
+    Searches the FAISS index for relevant context when available, otherwise falls back to standard chat.
+    
+    The reply is streamed as Server-Sent Events, each a JSON object with a 'type':
+      - context: {'context_chunks': [...]}, sent first
+      - delta:   {'content': '...'}, one per generated text fragment
+      - usage:   {'usage': {...}}, token counts once generation finishes
+      - error:   {'detail': '...'}, if generation fails mid-stream
     """
     try:
         if not request.messages:
@@ -80,8 +267,12 @@ async def chat(request: ChatRequest):
         context_chunks = []
         context_text = ""
         
-        # Try to retrieve context from Chroma if available
-        if chroma_collection:
+        # Loading can block, so it runs in a worker thread
+        search_index = await asyncio.to_thread(get_search_index)
+        
+        # Retrieval runs to completion before the response starts, so a failure
+        # here is reported with an HTTP error status instead of in-stream
+        if search_index is not None:
             # Get the last user message as the query
             user_message = next(
                 (msg.content for msg in reversed(request.messages) if msg.role == 'user'),
@@ -89,36 +280,10 @@ async def chat(request: ChatRequest):
             )
             
             if user_message:
-                try:
-                    # Generate embedding for the user's question
-                    embedding_response = await client.embeddings.create(
-                        model="text-embedding-3-small",
-                        input=user_message
-                    )
-                    question_embedding = embedding_response.data[0].embedding
-                    
-                    # Query Chroma for similar chunks
-                    results = chroma_collection.query(
-                        query_embeddings=[question_embedding],
-                        n_results=5
-                    )
-                    
-                    # Extract context chunks
-                    if results['documents'] and results['documents'][0]:
-                        for i, doc in enumerate(results['documents'][0]):
-                            metadata = results['metadatas'][0][i] if results['metadatas'] else {}
-                            context_chunks.append(ContextChunk(
-                                text=doc,
-                                source_file=metadata.get('source_file', 'Unknown'),
-                                heading=metadata.get('heading', 'No heading')
-                            ))
-                            context_text += f"\n\n--- Context {i+1} ---\n{doc}"
-                except Exception as e:
-                    # If retrieval fails, continue without context
-                    print(f"Context retrieval failed: {str(e)}")
+                context_chunks, context_text = await retrieve_context(user_message, search_index)
         
         # Build messages with injected context if available
-        messages_dict = [msg.model_dump() for msg in request.messages]
+        messages_dict = [{'role': msg.role, 'content': msg.content} for msg in request.messages]
         
         if context_text:
             # Inject context into system message
@@ -132,28 +297,47 @@ Context from user's documents:{context_text}
 
 Provide clear, helpful answers based on this context when relevant."""
             }
-            messages_dict.insert(0, system_message)
+            messages_dict = [system_message, *messages_dict]
         
         # Call OpenAI API
-        response = await client.chat.completions.create(
+        stream = await client.chat.completions.create(
             model="gpt-4o-mini",
             messages=messages_dict,
             temperature=0.7,
-            max_tokens=1500
+            max_tokens=1500,
+            stream=True,
+            stream_options={"include_usage": True}
         )
         
-        assistant_message = response.choices[0].message.content
+        async def event_stream():
+            yield sse_event({
+                'type': 'context',
+                'context_chunks': [chunk.model_dump() for chunk in context_chunks]
+            })
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield sse_event({'type': 'delta', 'content': chunk.choices[0].delta.content})
+                    if chunk.usage:
+                        usage = UsageInfo(
+                            prompt_tokens=chunk.usage.prompt_tokens,
+                            completion_tokens=chunk.usage.completion_tokens,
+                            total_tokens=chunk.usage.total_tokens
+                        )
+                        yield sse_event({'type': 'usage', 'usage': usage.model_dump()})
+            except Exception as e:
+                # Headers are already sent, so report the failure in-stream
+                yield sse_event({'type': 'error', 'detail': str(e)})
         
-        return RagChatResponse(
-            message=assistant_message,
-            usage=UsageInfo(
-                prompt_tokens=response.usage.prompt_tokens,
-                completion_tokens=response.usage.completion_tokens,
-                total_tokens=response.usage.total_tokens
-            ),
-            context_chunks=context_chunks
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            # Ask reverse proxies not to buffer the stream
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
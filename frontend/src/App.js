@@ -1,5 +1,4 @@
 import React, { useState, useRef, useEffect } from 'react';
-import axios from 'axios';
 import './App.css';
 
 // Use environment variable for API URL, fallback to relative path for development proxy
@@ -40,17 +39,57 @@ function App() {
       // Prepare messages for API (include conversation history)
       const conversationHistory = [...messages, userMessage];
 
-      const response = await axios.post(`${API_BASE_URL}/api/chat`, {
-        messages: conversationHistory
+      const response = await fetch(`${API_BASE_URL}/api/chat`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ messages: conversationHistory })
       });
 
-      const assistantMessage = {
-        role: 'assistant',
-        content: response.data.message,
-        contextChunks: response.data.context_chunks || []
+      if (!response.ok || !response.body) {
+        throw new Error(`Request failed with status ${response.status}`);
+      }
+
+      // The reply streams as Server-Sent Events: context first, then text deltas
+      let contextChunks = [];
+      let content = '';
+      let started = false;
+
+      const showAssistantMessage = () => {
+        const assistantMessage = { role: 'assistant', content, contextChunks };
+        // Append on the first delta, then replace the message as it grows
+        const replaceLast = started;
+        setMessages(prev => replaceLast
+          ? [...prev.slice(0, -1), assistantMessage]
+          : [...prev, assistantMessage]);
+        started = true;
       };
 
-      setMessages(prev => [...prev, assistantMessage]);
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split('\n\n');
+        buffer = events.pop();  // Keep any incomplete event for the next read
+
+        for (const event of events) {
+          if (!event.startsWith('data: ')) continue;
+          const data = JSON.parse(event.slice('data: '.length));
+
+          if (data.type === 'context') {
+            contextChunks = data.context_chunks || [];
+          } else if (data.type === 'delta') {
+            content += data.content;
+            showAssistantMessage();
+          } else if (data.type === 'error') {
+            throw new Error(data.detail);
+          }
+        }
+      }
     } catch (error) {
       console.error('Error sending message:', error);
       const errorMessage = {
@@ -124,7 +163,8 @@ function App() {
             </div>
           ))}
           
-          {isLoading && (
+          {/* Show the typing indicator until the reply starts streaming in */}
+          {isLoading && messages[messages.length - 1]?.role === 'user' && (
             <div className="message assistant-message">
               <div className="message-content">
                 <div className="message-role">AI Assistant</div>
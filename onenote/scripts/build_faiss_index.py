@@ -0,0 +1,134 @@
+"""
+Build FAISS Index
+Exports the chunks stored in Chroma into a FAISS index for fast retrieval.
+The backend searches this index instead of querying Chroma directly.
+Large corpora additionally get an IVF index, which the backend memory-maps.
+"""
+
+import os
+import pickle
+from pathlib import Path
+
+import chromadb
+import faiss
+import numpy as np
+
+# File names inside the index folder (read by backend/app.py)
+INDEX_FILENAME = 'onenote.faiss'
+IVF_INDEX_FILENAME = 'onenote.ivf'
+METADATA_FILENAME = 'onenote_meta.pkl'
+
+# HNSW graph parameters
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+
+# IVF parameters. Below IVF_MIN_VECTORS there are too few vectors to train
+# sqrt(N) clusters well, and HNSW is already fast enough.
+IVF_MIN_VECTORS = 10000
+IVF_NPROBE = 8
+
+
+def _replace_atomically(path: Path, write):
+    """
+    Write a file next to its destination, then rename it into place.
+
+    The backend memory-maps the IVF index, so an existing file must never be
+    truncated or rewritten in place: os.replace() swaps in a new inode and
+    open mappings keep reading the old one until they are reloaded.
+
+    Args:
+        path: Destination file
+        write: Callable that writes the file at the path it is given
+    """
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _write_faiss_index(index, path: Path):
+    _replace_atomically(path, lambda tmp_path: faiss.write_index(index, str(tmp_path)))
+
+
+def build_faiss_index(collection, index_folder: Path):
+    """
+    Build an HNSW index over every chunk in a Chroma collection.
+
+    Vectors are L2-normalized so inner product search ranks by cosine similarity.
+    Chunk ids, texts and metadata are pickled as arrays parallel to the index rows.
+
+    Args:
+        collection: Chroma collection containing the chunks
+        index_folder: Folder to write the index and metadata files to
+    """
+    data = collection.get(include=['embeddings', 'documents', 'metadatas'])
+
+    if not data['ids']:
+        print("No chunks in Chroma, skipping FAISS index")
+        return
+
+    vectors = np.asarray(data['embeddings'], dtype=np.float32)
+    faiss.normalize_L2(vectors)
+
+    index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.add(vectors)
+
+    index_folder.mkdir(parents=True, exist_ok=True)
+    _write_faiss_index(index, index_folder / INDEX_FILENAME)
+
+    ivf_path = index_folder / IVF_INDEX_FILENAME
+    if len(vectors) >= IVF_MIN_VECTORS:
+        build_ivf_index(vectors, ivf_path)
+    elif ivf_path.exists():
+        # Corpus shrank below the threshold; don't leave a stale index behind
+        ivf_path.unlink()
+
+    # Replaced last: the backend reloads when this file's mtime changes
+    def write_metadata(path):
+        with open(path, 'wb') as f:
+            pickle.dump({
+                'ids': data['ids'],
+                'documents': data['documents'],
+                'metadatas': data['metadatas']
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    _replace_atomically(index_folder / METADATA_FILENAME, write_metadata)
+
+    print(f"✓ Built FAISS index with {index.ntotal} chunks in: {index_folder}")
+
+
+def build_ivf_index(vectors: np.ndarray, ivf_path: Path):
+    """
+    Build an inverted-file index with sqrt(N) clusters over normalized vectors.
+
+    A search only visits IVF_NPROBE of the clusters, and the backend loads this
+    file memory-mapped so cluster lists are paged in on demand.
+
+    Args:
+        vectors: L2-normalized float32 vectors, one row per chunk
+        ivf_path: File to write the index to
+    """
+    dim = vectors.shape[1]
+    nlist = int(np.sqrt(len(vectors)))
+
+    quantizer = faiss.IndexFlatIP(dim)
+    index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+    index.train(vectors)
+    index.add(vectors)
+    index.nprobe = IVF_NPROBE
+
+    _write_faiss_index(index, ivf_path)
+
+    print(f"✓ Built IVF index with {nlist} clusters")
+
+
+if __name__ == '__main__':
+    chroma_db_path = Path(__file__).parent / '../../chroma_db'
+    index_folder = Path(__file__).parent / '../../faiss_index'
+
+    chroma_client = chromadb.PersistentClient(path=str(chroma_db_path))
+    collection = chroma_client.get_collection(name="onenote_chunks")
+    build_faiss_index(collection, index_folder)
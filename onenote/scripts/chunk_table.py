@@ -0,0 +1,78 @@
+"""
+Chunk Table
+Column-oriented (struct-of-arrays) representation of many chunks.
+Each column is one NumPy array, so batches are cheap slices instead of
+lists of per-chunk dictionaries.
+"""
+
+from dataclasses import dataclass
+from typing import Iterable, List, Dict, Optional
+
+import numpy as np
+
+# Marks a chunk that has no recorded token count (chunk files from older versions)
+UNKNOWN_TOKEN_COUNT = -1
+
+
+@dataclass
+class ChunkTable:
+    """
+    Chunks of one or more documents, one row per chunk.
+
+    Attributes:
+        text: Chunk texts (object array)
+        doc_id: Index of the document each chunk came from (int32), in document order
+        token_count: Tokens per chunk (int32), UNKNOWN_TOKEN_COUNT if not recorded
+        embedding: Embedding matrix with one row per chunk, or None until embedded
+    """
+    text: np.ndarray
+    doc_id: np.ndarray
+    token_count: np.ndarray
+    embedding: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return self.text.size
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[List[Dict]], estimated_n: int = 1024) -> 'ChunkTable':
+        """
+        Build a table from each document's list of chunk dictionaries.
+
+        Rows are written into preallocated columns that double in size when
+        full, then trimmed to the number of chunks at the end.
+
+        Args:
+            documents: Chunk lists, one per document; may be a generator
+            estimated_n: Initial column capacity
+
+        Returns:
+            ChunkTable with the chunks of all documents, in order
+        """
+        capacity = max(estimated_n, 1)
+        text = np.empty(capacity, dtype=object)
+        doc_id = np.empty(capacity, dtype=np.int32)
+        token_count = np.empty(capacity, dtype=np.int32)
+        n = 0
+
+        for idx, chunks in enumerate(documents):
+            end = n + len(chunks)
+            if end > capacity:
+                while end > capacity:
+                    capacity *= 2
+                text = np.resize(text, capacity)
+                doc_id = np.resize(doc_id, capacity)
+                token_count = np.resize(token_count, capacity)
+
+            text[n:end] = [chunk['text'] for chunk in chunks]
+            doc_id[n:end] = idx
+            token_count[n:end] = [chunk.get('token_count', UNKNOWN_TOKEN_COUNT) for chunk in chunks]
+            n = end
+
+        return cls(text=text[:n], doc_id=doc_id[:n], token_count=token_count[:n])
+
+    def document_bounds(self, num_documents: int) -> np.ndarray:
+        """
+        Return the row offsets at which each document's chunks start, plus the
+        table length, so document i is rows bounds[i]:bounds[i + 1].
+        """
+        return np.searchsorted(self.doc_id, np.arange(num_documents + 1))
@@ -4,22 +4,78 @@ Splits processed documents into chunks suitable for embedding and retrieval.
 """
 
 import os
-import json
+import orjson
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Tuple
+import numpy as np
+import tiktoken
+from chunk_table import ChunkTable
+
+# Tokenizer used by OpenAI's embedding and chat models
+ENCODING = tiktoken.get_encoding("cl100k_base")
+
+
+def _compute_windows_numpy(offsets, chunk_size, overlap):
+    """
+    Compute the overlapping chunk windows over a tokenized text.
+    
+    Args:
+        offsets: Character offset at which each token starts, followed by the text length
+        chunk_size: Number of tokens per chunk
+        overlap: Number of tokens shared by consecutive chunks
+    
+    Returns:
+        Tuple of arrays (start offsets, end offsets, token counts), one entry per chunk
+    """
+    n_tokens = len(offsets) - 1
+    first = np.arange(0, n_tokens, chunk_size - overlap)
+    last = np.minimum(first + chunk_size, n_tokens)
+    return offsets[first], offsets[last], last - first
+
+
+def _compute_windows_loop(offsets, chunk_size, overlap):
+    """
+    Same as _compute_windows_numpy, written as a single loop for Numba to compile.
+    """
+    n_tokens = len(offsets) - 1
+    step = chunk_size - overlap
+    n_windows = (n_tokens + step - 1) // step
+    
+    starts = np.empty(n_windows, dtype=np.int64)
+    ends = np.empty(n_windows, dtype=np.int64)
+    token_counts = np.empty(n_windows, dtype=np.int64)
+    
+    for i in range(n_windows):
+        first = i * step
+        last = min(first + chunk_size, n_tokens)
+        starts[i] = offsets[first]
+        ends[i] = offsets[last]
+        token_counts[i] = last - first
+    
+    return starts, ends, token_counts
+
+
+try:
+    from numba import njit
+    _compute_windows = njit(cache=True)(_compute_windows_loop)
+except ImportError:
+    # Numba is optional; without it the vectorized NumPy version is used
+    _compute_windows = _compute_windows_numpy
+
 
 class TextChunker:
     def __init__(self, 
                  processed_folder='../processed',
-                 chunk_size=500,
-                 overlap=50):
+                 chunk_size=400,
+                 overlap=40):
         """
         Initialize the chunker.
         
         Args:
             processed_folder: Path to processed JSON files
-            chunk_size: Target number of words per chunk
-            overlap: Number of words to overlap between chunks
+            chunk_size: Target number of tokens per chunk
+            overlap: Number of tokens to overlap between chunks
         """
         self.processed_folder = Path(__file__).parent / processed_folder
         self.chunk_size = chunk_size
@@ -36,38 +92,39 @@ class TextChunker:
         Returns:
             List of chunk dictionaries with text and metadata
         """
-        words = text.split()
-        chunks = []
+        tokens = ENCODING.encode(text)
+        n = len(tokens)
+        chunk_size = self.chunk_size
         
-        if len(words) <= self.chunk_size:
+        if n <= chunk_size:
             # Text is short enough, return as single chunk
-            chunks.append({
+            return [{
                 'text': text,
-                'word_count': len(words),
+                'token_count': n,
                 **metadata
-            })
-            return chunks
-        
-        # Create overlapping chunks
-        start = 0
-        chunk_num = 0
-        
-        while start < len(words):
-            end = start + self.chunk_size
-            chunk_words = words[start:end]
-            chunk_text = ' '.join(chunk_words)
-            
-            chunks.append({
-                'text': chunk_text,
-                'word_count': len(chunk_words),
+            }]
+        
+        # Decode once to get the character offset at which every token starts,
+        # plus a sentinel for the end of the text
+        decoded, offsets = ENCODING.decode_with_offsets(tokens)
+        offsets = np.array(offsets + [len(decoded)], dtype=np.int64)
+        
+        # Create overlapping chunks, one every (chunk_size - overlap) tokens.
+        # Window boundaries are computed as arrays (compiled with Numba when it
+        # is installed); each chunk's text is then a single slice of the decoded
+        # text instead of a decode per chunk.
+        starts, ends, token_counts = _compute_windows(offsets, chunk_size, self.overlap)
+        starts, ends, token_counts = starts.tolist(), ends.tolist(), token_counts.tolist()
+        
+        return [
+            {
+                'text': decoded[start:end],
+                'token_count': token_count,
                 'chunk_num': chunk_num,
                 **metadata
-            })
-            
-            chunk_num += 1
-            start += self.chunk_size - self.overlap
-        
-        return chunks
+            }
+            for chunk_num, (start, end, token_count) in enumerate(zip(starts, ends, token_counts))
+        ]
     
     def process_document(self, json_filename: str) -> List[Dict]:
         """
@@ -85,10 +142,23 @@ class TextChunker:
             print(f"Error: File {json_filename} not found")
             return []
         
-        print(f"Chunking: {json_filename}")
+        with open(json_path, 'rb') as f:
+            doc_data = orjson.loads(f.read())
+        
+        _, chunks_data = self.chunk_document(doc_data)
+        return chunks_data['chunks']
+    
+    def chunk_document(self, doc_data: Dict) -> Tuple[str, Dict]:
+        """
+        Create chunks for an already loaded document and save them as JSON.
+        
+        Args:
+            doc_data: Processed document, as produced by DocumentImporter
         
-        with open(json_path, 'r', encoding='utf-8') as f:
-            doc_data = json.load(f)
+        Returns:
+            Tuple of the chunks file name and the chunks file contents
+        """
+        print(f"Chunking: {doc_data['source_file']}")
         
         all_chunks = []
         
@@ -107,9 +177,9 @@ class TextChunker:
         
         print(f"  - Created {len(all_chunks)} chunks")
         
-        # Save chunks as separate JSON
-        output_filename = f"{json_path.stem}_chunks.json"
-        output_path = json_path.parent / output_filename
+        # Save chunks as separate JSON, next to the processed document
+        output_filename = f"{Path(doc_data['source_file']).stem}_chunks.json"
+        output_path = self.processed_folder / output_filename
         
         chunks_data = {
             'source_document': doc_data['source_file'],
@@ -119,19 +189,19 @@ class TextChunker:
             'chunks': all_chunks
         }
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(chunks_data, f, indent=2, ensure_ascii=False)
+        with open(output_path, 'wb') as f:
+            f.write(orjson.dumps(chunks_data))
         
         print(f"✓ Saved chunks to: {output_path.name}")
         
-        return all_chunks
+        return output_filename, chunks_data
     
-    def process_all_documents(self) -> List[Dict]:
+    def process_all_documents(self) -> ChunkTable:
         """
         Process all JSON files in the processed folder.
         
         Returns:
-            List of all chunks from all documents
+            ChunkTable with the chunks of all documents (doc_id follows the file order)
         """
         json_files = [f for f in self.processed_folder.glob('*.json') 
                      if not f.name.endswith('_chunks.json')]
@@ -139,19 +209,19 @@ class TextChunker:
         if not json_files:
             print(f"No processed JSON files found in {self.processed_folder}")
             print("\nRun import_docs.py first to process your .docx files")
-            return []
+            return ChunkTable.from_documents([])
         
         print(f"Found {len(json_files)} document(s) to chunk\n")
         
-        all_chunks = []
-        for json_file in json_files:
-            chunks = self.process_document(json_file.name)
-            all_chunks.extend(chunks)
+        # Documents are independent, so chunk them in parallel
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = executor.map(self.process_document, [f.name for f in json_files])
+            table = ChunkTable.from_documents(results, estimated_n=64 * len(json_files))
         
-        print(f"\n✓ Total chunks created: {len(all_chunks)}")
-        return all_chunks
+        print(f"\n✓ Total chunks created: {table.text.size}")
+        return table
 
 
 if __name__ == '__main__':
-    chunker = TextChunker(chunk_size=500, overlap=50)
+    chunker = TextChunker(chunk_size=400, overlap=40)
     chunker.process_all_documents()
@@ -0,0 +1,93 @@
+"""
+Embedding Cache
+Persistent, content-addressed store of embedding vectors.
+Lets the pipeline skip the OpenAI API for chunks whose text hasn't changed.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Optional
+
+import numpy as np
+
+# Stay below SQLite's limit on the number of query parameters
+MAX_QUERY_PARAMS = 500
+
+
+class EmbeddingCache:
+    def __init__(self,
+                 cache_path='../cache/embeddings.sqlite',
+                 ttl_seconds: Optional[float] = None):
+        """
+        Initialize the embedding cache.
+
+        Args:
+            cache_path: Path to the SQLite cache file
+            ttl_seconds: Age after which cached vectors are ignored (None = never expire)
+        """
+        self.cache_path = Path(__file__).parent / cache_path
+        self.ttl_seconds = ttl_seconds
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # The pipeline writes batches from worker threads; one connection is
+        # shared and every use of it holds the lock
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embed_cache "
+            "(key TEXT PRIMARY KEY, vec BLOB, created_at REAL)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def key(model: str, text: str) -> str:
+        """
+        Build the cache key for a text. The model name is part of the key so
+        switching models never returns stale vectors.
+        """
+        return hashlib.sha256(f"{model}\0{text}".encode()).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached embeddings.
+
+        Args:
+            keys: Cache keys to look up
+
+        Returns:
+            Dictionary mapping each cached (and unexpired) key to its embedding vector
+        """
+        min_created = time.time() - self.ttl_seconds if self.ttl_seconds is not None else 0.0
+
+        cached = {}
+        with self._lock:
+            for i in range(0, len(keys), MAX_QUERY_PARAMS):
+                batch = keys[i:i + MAX_QUERY_PARAMS]
+                placeholders = ','.join('?' * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, vec FROM embed_cache WHERE key IN ({placeholders}) AND created_at >= ?",
+                    [*batch, min_created]
+                )
+                for key, vec in rows:
+                    cached[key] = np.frombuffer(vec, dtype=np.float32).tolist()
+        return cached
+
+    def put_many(self, keys: List[str], embeddings: List[List[float]]):
+        """
+        Store embeddings in the cache, in a single transaction.
+
+        Args:
+            keys: Cache keys, parallel to embeddings
+            embeddings: Embedding vectors to store
+        """
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embed_cache (key, vec, created_at) VALUES (?, ?, ?)",
+                [(key, np.asarray(vec, dtype=np.float32).tobytes(), now)
+                 for key, vec in zip(keys, embeddings)]
+            )
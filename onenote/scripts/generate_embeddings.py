@@ -1,28 +1,82 @@
 """
 Embedding Generation Script
 Generates embeddings for text chunks using OpenAI's embedding model.
-Also stores embeddings in Chroma vector database.
+Also stores embeddings in Chroma vector database and exports a FAISS index.
 """
 
 import os
-import json
+import orjson
 import asyncio
 from pathlib import Path
-from typing import List, Dict
-from openai import AsyncOpenAI
+from typing import Awaitable, Callable, List, Dict, Optional, Sequence, Tuple
+from openai import AsyncOpenAI, APIConnectionError, InternalServerError, RateLimitError
 from dotenv import load_dotenv
 from datetime import datetime
 import chromadb
+import numpy as np
+import tiktoken
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+from build_faiss_index import build_faiss_index
+from chunk_table import ChunkTable, UNKNOWN_TOKEN_COUNT
+from embedding_cache import EmbeddingCache
+from progress_log import ProgressLog
 
 # Load environment variables
 load_dotenv(Path(__file__).parent.parent.parent / '.env')
 
+# Limits for a single embedding request: the API accepts at most 2048 inputs
+# and 300k tokens in total (kept below that to leave headroom for counting
+# differences), plus how many requests may be in flight at once
+MAX_BATCH_INPUTS = 2048
+MAX_BATCH_TOKENS = 280_000
+MAX_CONCURRENT_REQUESTS = 16
+
+# Transient API failures worth retrying (APITimeoutError is an APIConnectionError)
+RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+
+
+def pack_batches(keys: List[str], token_counts: Dict[str, int]) -> List[List[str]]:
+    """
+    Greedily pack texts into as few requests as the API limits allow.
+    
+    Texts are taken longest first, and a new batch is started whenever the
+    next text would exceed MAX_BATCH_TOKENS or MAX_BATCH_INPUTS.
+    
+    Args:
+        keys: Cache keys of the texts to embed
+        token_counts: Token count of each text, by cache key
+    
+    Returns:
+        List of batches, each a list of cache keys
+    """
+    batches = []
+    batch = []
+    batch_tokens = 0
+    
+    for key in sorted(keys, key=token_counts.__getitem__, reverse=True):
+        tokens = token_counts[key]
+        if batch and (batch_tokens + tokens >= MAX_BATCH_TOKENS or len(batch) >= MAX_BATCH_INPUTS):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append(key)
+        batch_tokens += tokens
+    
+    if batch:
+        batches.append(batch)
+    return batches
+
+
 class EmbeddingGenerator:
     def __init__(self, 
                  processed_folder='../processed',
                  embeddings_folder='../embeddings',
                  chroma_db_path='../../chroma_db',
-                 model='text-embedding-3-small'):
+                 faiss_index_path='../../faiss_index',
+                 model='text-embedding-3-small',
+                 cache: Optional[EmbeddingCache] = None,
+                 dtype=np.float16,
+                 progress: Optional[ProgressLog] = None):
         """
         Initialize the embedding generator.
         
@@ -30,12 +84,18 @@ class EmbeddingGenerator:
             processed_folder: Path to processed JSON files with chunks
             embeddings_folder: Path to save embeddings
             chroma_db_path: Path to Chroma database
+            faiss_index_path: Path to write the FAISS index used by the backend
             model: OpenAI embedding model to use
+            cache: Embedding cache to reuse vectors from (defaults to onenote/cache/embeddings.sqlite)
+            dtype: NumPy dtype of the vectors saved in the .npz backups
+            progress: Log of documents already stored by an interrupted run (defaults to onenote/cache/progress.jsonl)
         """
         self.processed_folder = Path(__file__).parent / processed_folder
         self.embeddings_folder = Path(__file__).parent / embeddings_folder
         self.chroma_db_path = Path(__file__).parent / chroma_db_path
+        self.faiss_index_path = Path(__file__).parent / faiss_index_path
         self.model = model
+        self.dtype = np.dtype(dtype)
         
         self.embeddings_folder.mkdir(parents=True, exist_ok=True)
         
@@ -44,7 +104,8 @@ class EmbeddingGenerator:
         if not api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
         
-        self.client = AsyncOpenAI(api_key=api_key)
+        # Retries are handled by embed_batch's backoff policy, not the SDK's own
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
         
         # Initialize Chroma client
         self.chroma_client = chromadb.PersistentClient(path=str(self.chroma_db_path))
@@ -52,124 +113,224 @@ class EmbeddingGenerator:
             name="onenote_chunks",
             metadata={"description": "OneNote document chunks with embeddings"}
         )
+        
+        # Initialize embedding cache (content-addressed, survives across runs)
+        self.cache = cache if cache is not None else EmbeddingCache()
+        
+        # Documents stored by a previous run that failed part way are skipped
+        self.progress = progress if progress is not None else ProgressLog()
+        
+        # Tokenizer for texts that arrive without a token count (loaded on first use)
+        self._encoding = None
     
     async def generate_embedding(self, text: str) -> List[float]:
         """
         Generate embedding for a single text.
+        Goes through embed_texts, so the cache and retries apply and errors propagate.
         
         Args:
             text: The text to embed
         
         Returns:
             List of floats representing the embedding vector
+        """
+        return (await self.embed_texts([text]))[0]
+    
+    @retry(wait=wait_exponential(max=30), stop=stop_after_attempt(8),
+           retry=retry_if_exception_type(RETRYABLE_ERRORS), reraise=True)
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for multiple texts in a single API request.
+        Rate limits, connection problems and server errors are retried with
+        exponential backoff.
         
-        sample response:
-            {
-              "object": "embedding",
-              "data": [
-                {
-                  "object": "embedding",
-                  "embedding": [0.0023, -0.0145, ...],
-                  "index": 0
-                }
-              ],
-              "model": "text-embedding-3-small",
-              "usage": {
-                "prompt_tokens": 8,
-                "total_tokens": 8
-              }
-            }
+        Args:
+            texts: List of texts to embed (at most 2048 per request)
+        
+        Returns:
+            List of embedding vectors, in the same order as texts
         """
-        try:
-            response = await self.client.embeddings.create(
-                model=self.model,
-                input=text
-            )
-            return response.data[0].embedding
-        except Exception as e:
-            print(f"Error generating embedding: {str(e)}")
-            return None
+        response = await self.client.embeddings.create(
+            model=self.model,
+            input=texts
+        )
+        # The API tags each vector with the position of its input text
+        return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+    
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens of a text with the embedding model's tokenizer.
+        """
+        if self._encoding is None:
+            self._encoding = tiktoken.encoding_for_model(self.model)
+        return len(self._encoding.encode(text))
     
-    async def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    async def embed_texts(self, texts: Sequence[str],
+                          token_counts: Optional[Sequence[int]] = None,
+                          on_ready: Optional[Callable[[List[int], List[List[float]]], Awaitable]] = None
+                          ) -> List[List[float]]:
         """
-        Generate embeddings for multiple texts in parallel.
+        Generate embeddings for any number of texts, reusing cached vectors.
+        
+        Texts missing from the cache are packed into as few requests as the
+        API's per-request limits allow (see pack_batches), and the requests
+        are sent concurrently (at most MAX_CONCURRENT_REQUESTS in flight).
         
         Args:
-            texts: List of texts to embed
+            texts: Texts to embed (a list, or a ChunkTable's text column)
+            token_counts: Token count of each text, if already known (e.g. from chunking)
+            on_ready: Coroutine function called with (positions in texts, their vectors)
+                      for the cached texts and then after every completed batch
         
         Returns:
-            List of embedding vectors
+            List of embedding vectors, in the same order as texts
         """
-        tasks = [self.generate_embedding(text) for text in texts]
-        # Asynchronously execute all tasks and gather results in order
-        return await asyncio.gather(*tasks)
+        # Reuse embeddings for texts that were already embedded in a previous run
+        keys = [EmbeddingCache.key(self.model, text) for text in texts]
+        cached = self.cache.get_many(keys)
+        
+        # Each distinct uncached text is embedded once
+        pending = {key: text for key, text in zip(keys, texts) if key not in cached}
+        
+        known_counts = dict(zip(keys, token_counts)) if token_counts is not None else {}
+        pending_tokens = {
+            key: known_counts[key] if key in known_counts else self.count_tokens(text)
+            for key, text in pending.items()
+        }
+        
+        print(f"  - {sum(key in cached for key in keys)} cached, {len(pending)} to embed")
+        
+        # Positions of each text, so results can be reported per input position
+        positions = {}
+        for position, key in enumerate(keys):
+            positions.setdefault(key, []).append(position)
+        
+        async def report(ready_keys):
+            if on_ready is not None and ready_keys:
+                ready = [(position, cached[key]) for key in ready_keys for position in positions[key]]
+                await on_ready([position for position, _ in ready], [vec for _, vec in ready])
+        
+        await report([key for key in positions if key in cached])
+        
+        batches = pack_batches(list(pending), pending_tokens)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        
+        errors = []
+        
+        async def embed_one_batch(batch_num: int, batch_keys: List[str]):
+            async with semaphore:
+                if errors:
+                    return  # An earlier batch failed, don't start new requests
+                print(f"    Batch {batch_num}/{len(batches)}...")
+                try:
+                    embeddings = await self.embed_batch([pending[key] for key in batch_keys])
+                except Exception as e:
+                    errors.append(e)
+                    return
+            # Cache each batch as soon as it arrives, so a later failure
+            # doesn't lose the batches that already succeeded
+            await asyncio.to_thread(self.cache.put_many, batch_keys, embeddings)
+            cached.update(zip(batch_keys, embeddings))
+            await report(batch_keys)
+        
+        # Batches already in flight when one fails still finish and are
+        # stored before the error is raised
+        await asyncio.gather(*[
+            embed_one_batch(batch_num, batch_keys)
+            for batch_num, batch_keys in enumerate(batches, start=1)
+        ])
+        if errors:
+            raise errors[0]
+        
+        return [cached[key] for key in keys]
     
-    async def process_chunks_file(self, chunks_filename: str):
+    def _load_chunks_file(self, chunks_filename: str):
         """
-        Process a chunks JSON file and generate embeddings.
+        Read a chunks JSON file.
         
         Args:
             chunks_filename: Name of the chunks JSON file
+        
+        Returns:
+            The chunks file contents, or None if the file doesn't exist
         """
         chunks_path = self.processed_folder / chunks_filename
         
         if not chunks_path.exists():
             print(f"Error: File {chunks_filename} not found")
-            return
-        
-        print(f"Processing: {chunks_filename}")
+            return None
         
-        with open(chunks_path, 'r', encoding='utf-8') as f:
-            chunks_data = json.load(f)
+        with open(chunks_path, 'rb') as f:
+            return orjson.loads(f.read())
+    
+    def _save_embeddings(self, chunks_filename: str, chunks_data: Dict, embeddings: np.ndarray):
+        """
+        Attach embeddings to a file's chunks, store them in Chroma and save a backup.
         
+        Args:
+            chunks_filename: Name of the chunks JSON file the chunks came from
+            chunks_data: The chunks file contents
+            embeddings: Embedding matrix, one row per chunk in chunks_data['chunks']
+        """
         chunks = chunks_data['chunks']
         total_chunks = len(chunks)
         
-        print(f"  - Generating embeddings for {total_chunks} chunks...")
-        
-        # Extract texts - texts is a list of strings
-        texts = [chunk['text'] for chunk in chunks]
-        
-        # Generate embeddings in batches of 100 (API limit)
-        batch_size = 100
-        all_embeddings = []
-        
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            batch_num = i // batch_size + 1
-            total_batches = (len(texts) + batch_size - 1) // batch_size
-            
-            print(f"    Batch {batch_num}/{total_batches}...")
-            embeddings = await self.generate_embeddings_batch(batch)
-            all_embeddings.extend(embeddings)
-        
         # Add embeddings to chunks
-        for chunk, embedding in zip(chunks, all_embeddings):
+        for chunk, embedding in zip(chunks, embeddings):
             chunk['embedding'] = embedding
             chunk['embedding_model'] = self.model
         
         # Save to Chroma vector database
-        print(f"  - Storing {total_chunks} chunks in Chroma...")
+        print(f"  - Storing {total_chunks} chunks from {chunks_filename} in Chroma...")
         self._store_in_chroma(chunks, chunks_data['source_document'])
         
-        # Create output data
-        output_data = {
-            'source_document': chunks_data['source_document'],
-            'embedding_model': self.model,
-            'total_chunks': total_chunks,
-            'generated_date': datetime.now().isoformat(),
-            'chunks': chunks
-        }
-        
-        # Save embeddings as JSON backup
-        output_filename = f"{chunks_path.stem}_embeddings.json"
+        # Save embeddings as a compressed NumPy backup. Vectors are stored as
+        # self.dtype; the float16 default costs negligible recall for cosine
+        # search at this dimensionality and halves the size of float32.
+        output_filename = f"{Path(chunks_filename).stem}_embeddings.npz"
         output_path = self.embeddings_folder / output_filename
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        np.savez_compressed(
+            output_path,
+            source_document=np.array(chunks_data['source_document']),
+            embedding_model=np.array(self.model),
+            generated_date=np.array(datetime.now().isoformat()),
+            vecs=np.asarray(embeddings, dtype=np.float32).astype(self.dtype),
+            texts=np.array([chunk['text'] for chunk in chunks], dtype=object),
+            meta=np.array(
+                [{k: v for k, v in chunk.items() if k not in ('text', 'embedding')}
+                 for chunk in chunks],
+                dtype=object
+            )
+        )
         
         print(f"✓ Saved embeddings to: {output_path.name}")
-        print(f"  - Embedding dimensions: {len(all_embeddings[0]) if all_embeddings else 0}")
+        print(f"  - Embedding dimensions: {embeddings.shape[1] if len(embeddings) else 0}")
+    
+    async def process_chunks_file(self, chunks_filename: str):
+        """
+        Process a single chunks JSON file: embed and store its chunks, then
+        rebuild the FAISS index.
+        
+        Args:
+            chunks_filename: Name of the chunks JSON file
+        """
+        chunks_data = self._load_chunks_file(chunks_filename)
+        if chunks_data is None:
+            return
+        
+        print(f"Processing: {chunks_filename}")
+        await self.embed_documents([(chunks_filename, chunks_data)])
+        self.build_index()
+    
+    def _token_counts(self, table: ChunkTable) -> Optional[np.ndarray]:
+        """
+        Return the token counts recorded by the chunker, or None if any chunk
+        lacks one (e.g. chunk files from an older version).
+        """
+        if (table.token_count == UNKNOWN_TOKEN_COUNT).any():
+            return None
+        return table.token_count
     
     def _store_in_chroma(self, chunks: List[Dict], source_document: str):
         """
@@ -202,7 +363,7 @@ class EmbeddingGenerator:
                 'heading_level': chunk.get('heading_level', 0),
                 'section_idx': chunk.get('section_idx', 0),
                 'chunk_num': chunk.get('chunk_num', idx),
-                'word_count': chunk.get('word_count', 0),
+                'token_count': chunk.get('token_count', 0),
                 'embedding_model': chunk.get('embedding_model', self.model)
             }
             metadatas.append(metadata)
@@ -217,6 +378,83 @@ class EmbeddingGenerator:
         
         print(f"  ✓ Stored {len(chunks)} chunks in Chroma database")
     
+    async def embed_documents(self, documents: List[Tuple[str, Dict]]):
+        """
+        Generate embeddings for several documents' chunks and store them.
+        
+        The chunks of all documents are embedded together, so requests are full
+        batches instead of one partial batch per document.
+        
+        Each document is stored as soon as all of its chunks are embedded, so
+        documents already stored by an interrupted previous run are skipped.
+        
+        Args:
+            documents: List of (chunks file name, chunks file contents) tuples
+        """
+        documents = [
+            (chunks_filename, chunks_data, ProgressLog.key(chunks_filename, chunks_data['chunks']))
+            for chunks_filename, chunks_data in documents
+        ]
+        resumed = [doc for doc in documents if self.progress.is_done(doc[2])]
+        if resumed:
+            print(f"Skipping {len(resumed)} document(s) stored by the interrupted previous run")
+            documents = [doc for doc in documents if not self.progress.is_done(doc[2])]
+            if not documents:
+                return
+        
+        table = ChunkTable.from_documents(data['chunks'] for _, data, _ in documents)
+        print(f"Generating embeddings for {table.text.size} chunks...")
+        
+        # Each document's chunks are a contiguous run of rows. A document is
+        # stored, and recorded in the progress log, as soon as the batches
+        # holding its last chunks have completed.
+        # Stores run in a worker thread so requests keep flowing meanwhile,
+        # one at a time since they share the Chroma client and progress log.
+        bounds = table.document_bounds(len(documents))
+        remaining = np.diff(bounds)
+        store_lock = asyncio.Lock()
+        
+        async def store_ready(positions: List[int], vectors: List[List[float]]):
+            if table.embedding is None:
+                table.embedding = np.empty((table.text.size, len(vectors[0])), dtype=np.float32)
+            table.embedding[positions] = vectors
+            
+            remaining[:] -= np.bincount(table.doc_id[positions], minlength=len(documents))
+            ready = np.flatnonzero(remaining == 0)
+            remaining[ready] = -1  # Stored
+            async with store_lock:
+                for idx in ready:
+                    await asyncio.to_thread(self._store_document, documents[idx],
+                                            table.embedding[bounds[idx]:bounds[idx + 1]])
+        
+        # Documents without chunks have nothing to wait for
+        for idx in np.flatnonzero(remaining == 0):
+            remaining[idx] = -1
+            await asyncio.to_thread(self._store_document, documents[idx], np.empty((0, 0), dtype=np.float32))
+        
+        await self.embed_texts(table.text, self._token_counts(table), on_ready=store_ready)
+    
+    def _store_document(self, document: Tuple[str, Dict, str], embeddings: np.ndarray):
+        """
+        Store one document's embedded chunks and record it in the progress log.
+        
+        Args:
+            document: Tuple of (chunks file name, chunks file contents, progress key)
+            embeddings: Embedding matrix, one row per chunk of the document
+        """
+        chunks_filename, chunks_data, progress_key = document
+        self._save_embeddings(chunks_filename, chunks_data, embeddings)
+        self.progress.mark_done(progress_key, len(embeddings))
+        print()
+    
+    def build_index(self):
+        """
+        Rebuild the backend's FAISS index over the whole collection.
+        This completes a run, so the progress log is cleared afterwards.
+        """
+        build_faiss_index(self.collection, self.faiss_index_path)
+        self.progress.clear()
+    
     async def process_all_chunks(self):
         """
         Process all chunk files and generate embeddings.
@@ -230,9 +468,10 @@ class EmbeddingGenerator:
         
         print(f"Found {len(chunks_files)} chunk file(s) to process\n")
         
-        for chunks_file in chunks_files:
-            await self.process_chunks_file(chunks_file.name)
-            print()
+        files_data = [(f.name, self._load_chunks_file(f.name)) for f in chunks_files]
+        await self.embed_documents(files_data)
+        
+        self.build_index()
         
         print("✓ All embeddings generated successfully!")
 
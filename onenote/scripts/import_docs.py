@@ -3,12 +3,169 @@ Document Import Script
 Reads .docx files from raw/ folder and extracts structured text.
 """
 
+import io
 import os
-import json
+import asyncio
+import orjson
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from docx import Document
+from docx.oxml.ns import qn
+from lxml import etree
 from datetime import datetime
 
+# Main document and style definition parts inside the .docx ZIP container
+DOCUMENT_XML = 'word/document.xml'
+STYLES_XML = 'word/styles.xml'
+
+# WordprocessingML tag names, resolved once
+W_BODY = qn('w:body')
+W_P = qn('w:p')
+W_R = qn('w:r')
+W_HYPERLINK = qn('w:hyperlink')
+W_T = qn('w:t')
+W_BR = qn('w:br')
+W_TYPE = qn('w:type')
+W_PSTYLE_PATH = f"{qn('w:pPr')}/{qn('w:pStyle')}"
+W_VAL = qn('w:val')
+W_STYLE = qn('w:style')
+W_STYLE_ID = qn('w:styleId')
+W_NAME = qn('w:name')
+W_BASED_ON = qn('w:basedOn')
+
+# Text equivalents of run content other than w:t and w:br, as in python-docx
+RUN_CHAR_TEXT = {
+    qn('w:tab'): '\t',
+    qn('w:ptab'): '\t',
+    qn('w:cr'): '\n',
+    qn('w:noBreakHyphen'): '-',
+}
+
+
+def _heading_level(style_name):
+    """
+    Return the heading level for a paragraph style name, or None if it is not a heading.
+    Built-in heading styles are named 'heading 1'..'heading 9' (shown as
+    'Heading 1'.. by python-docx and Word) and 'Title'.
+    """
+    if style_name is None:
+        return None
+    if style_name.lower().startswith('heading'):
+        suffix = style_name[len('heading'):].strip()
+        return int(suffix) if suffix.isdigit() else 1
+    if style_name == 'Title':
+        return 1
+    return None
+
+
+def _read_heading_levels(z):
+    """
+    Map the paragraph style ids of a .docx file to heading levels.
+    
+    Styles are matched on their name rather than their id, since ids are
+    localized (e.g. 'berschrift1' or 'Titre1' for 'heading 1'). A style that is
+    not a heading itself counts as one if it is based on a heading style.
+    
+    Args:
+        z: Open ZipFile of the .docx file
+    
+    Returns:
+        Dictionary mapping style id to heading level, for heading styles only,
+        or None if the file has no styles part
+    """
+    try:
+        root = etree.fromstring(z.read(STYLES_XML), etree.XMLParser(resolve_entities=False))
+    except KeyError:
+        return None
+    
+    names = {}
+    based_on = {}
+    for style in root.iterchildren(W_STYLE):
+        if style.get(W_TYPE) != 'paragraph':
+            continue
+        style_id = style.get(W_STYLE_ID)
+        name = style.find(W_NAME)
+        names[style_id] = name.get(W_VAL) if name is not None else style_id
+        base = style.find(W_BASED_ON)
+        if base is not None:
+            based_on[style_id] = base.get(W_VAL)
+    
+    levels = {}
+    for style_id in names:
+        seen = set()
+        current = style_id
+        while current is not None and current not in seen:
+            level = _heading_level(names.get(current))
+            if level is not None:
+                levels[style_id] = level
+                break
+            seen.add(current)
+            current = based_on.get(current)
+    return levels
+
+
+def _paragraph_text(p):
+    """
+    Return the text of a w:p element the way python-docx's Paragraph.text does:
+    the runs directly in the paragraph or in its hyperlinks, with tabs and line
+    breaks kept as '\t' and '\n' (page and column breaks add nothing).
+    """
+    parts = []
+    for el in p.iterchildren(W_R, W_HYPERLINK):
+        runs = el.iterchildren(W_R) if el.tag == W_HYPERLINK else (el,)
+        for run in runs:
+            for child in run:
+                if child.tag == W_T:
+                    parts.append(child.text or '')
+                elif child.tag == W_BR:
+                    if child.get(W_TYPE, 'textWrapping') == 'textWrapping':
+                        parts.append('\n')
+                else:
+                    parts.append(RUN_CHAR_TEXT.get(child.tag, ''))
+    return ''.join(parts)
+
+
+def _iter_body_paragraphs(docx_path):
+    """
+    Stream the top-level paragraphs of a .docx file.
+    
+    document.xml is parsed incrementally straight from the ZIP container, and
+    every element is discarded once it has been read, so memory use stays flat
+    regardless of document length.
+    
+    Args:
+        docx_path: Path to the .docx file
+    
+    Yields:
+        Tuple of (paragraph text, heading level or None if not a heading)
+    """
+    with zipfile.ZipFile(docx_path) as z, z.open(DOCUMENT_XML) as f:
+        heading_levels = _read_heading_levels(z)
+        
+        for _, p in etree.iterparse(f, tag=W_P, resolve_entities=False):
+            body = p.getparent()
+            if body is None or body.tag != W_BODY:
+                # Paragraph inside a table, text box etc.; it is freed
+                # together with its enclosing body-level element
+                continue
+            
+            style = p.find(W_PSTYLE_PATH)
+            style_id = style.get(W_VAL) if style is not None else None
+            if heading_levels is None:
+                # No style definitions to resolve against; match the id itself
+                level = _heading_level(style_id)
+            else:
+                level = heading_levels.get(style_id)
+            
+            yield _paragraph_text(p).strip(), level
+            
+            # Drop this paragraph and everything before it
+            p.clear()
+            while p.getprevious() is not None:
+                del body[0]
+
+
 class DocumentImporter:
     def __init__(self, raw_folder='../raw', processed_folder='../processed'):
         self.raw_folder = Path(__file__).parent / raw_folder
@@ -23,46 +180,47 @@ class DocumentImporter:
         Extract text from a .docx file with structure preservation.
         Returns a list of sections with text and metadata.
         """
-        doc = Document(docx_path)
         sections = []
+        headings = []
         current_section = {
             'heading': 'Introduction',
             'level': 0,
-            'content': []
+            'buf': io.StringIO()
         }
         
-        for para in doc.paragraphs:
-            text = para.text.strip()
-            
+        for text, level in _iter_body_paragraphs(docx_path):
             if not text:
                 continue
             
             # Check if it's a heading
-            if para.style.name.startswith('Heading'):
+            if level is not None:
+                headings.append(text)
+                
                 # Save previous section if it has content
-                if current_section['content']:
-                    current_section['text'] = '\n'.join(current_section['content'])
-                    sections.append(current_section.copy())
+                if current_section['buf'].tell():
+                    current_section['text'] = current_section.pop('buf').getvalue().rstrip('\n')
+                    sections.append(current_section)
                 
                 # Start new section
-                level = int(para.style.name.replace('Heading ', '')) if para.style.name != 'Heading' else 1
                 current_section = {
                     'heading': text,
                     'level': level,
-                    'content': []
+                    'buf': io.StringIO()
                 }
             else:
                 # Regular paragraph
-                current_section['content'].append(text)
+                current_section['buf'].write(text)
+                current_section['buf'].write('\n')
         
         # Add the last section
-        if current_section['content']:
-            current_section['text'] = '\n'.join(current_section['content'])
+        if current_section['buf'].tell():
+            current_section['text'] = current_section.pop('buf').getvalue().rstrip('\n')
             sections.append(current_section)
         
-        # If no sections were created (no headings), create one section with all content
+        # If no sections were created, every paragraph was a heading;
+        # create one section with all of them
         if not sections:
-            all_text = '\n\n'.join([para.text.strip() for para in doc.paragraphs if para.text.strip()])
+            all_text = '\n\n'.join(headings)
             sections.append({
                 'heading': 'Document Content',
                 'level': 1,
@@ -98,8 +256,8 @@ class DocumentImporter:
             output_filename = f"{docx_path.stem}.json"
             output_path = self.processed_folder / output_filename
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(doc_data, f, indent=2, ensure_ascii=False)
+            with open(output_path, 'wb') as f:
+                f.write(orjson.dumps(doc_data))
             
             print(f"✓ Saved to: {output_path}")
             print(f"  - {len(sections)} sections extracted")
@@ -110,6 +268,18 @@ class DocumentImporter:
             print(f"Error processing {filename}: {str(e)}")
             return None
     
+    def _process_pool(self, num_files):
+        """
+        Create a process pool for parsing, with no more workers than files.
+        """
+        return ProcessPoolExecutor(max_workers=min(num_files, os.cpu_count() or 1))
+    
+    def _worker(self):
+        """
+        Return a picklable callable that processes one file (by name) in a worker process.
+        """
+        return partial(_parse_one, str(self.raw_folder), str(self.processed_folder))
+    
     def process_all_documents(self):
         """
         Process all .docx files in the raw folder.
@@ -126,14 +296,49 @@ class DocumentImporter:
         
         print(f"Found {len(docx_files)} document(s) to process\n")
         
-        results = []
-        for docx_file in docx_files:
-            result = self.process_document(docx_file.name)
-            if result:
-                results.append(result)
+        filenames = [f.name for f in docx_files]
+        
+        if len(filenames) == 1:
+            # Not worth starting worker processes for a single file
+            results = [self.process_document(filenames[0])]
+        else:
+            # Each file is parsed independently, so spread them across CPU cores
+            with self._process_pool(len(filenames)) as executor:
+                results = list(executor.map(self._worker(), filenames, chunksize=4))
+        results = [result for result in results if result]
         
         print(f"\n✓ Successfully processed {len(results)} document(s)")
         return results
+    
+    async def stream(self):
+        """
+        Process all .docx files in the raw folder, yielding each document as soon
+        as it has been parsed, so later pipeline stages can start on it.
+        """
+        docx_files = list(self.raw_folder.glob('*.docx'))
+        
+        if not docx_files:
+            print(f"No .docx files found in {self.raw_folder}")
+            return
+        
+        print(f"Found {len(docx_files)} document(s) to process\n")
+        
+        loop = asyncio.get_running_loop()
+        with self._process_pool(len(docx_files)) as executor:
+            worker = self._worker()
+            futures = [loop.run_in_executor(executor, worker, f.name) for f in docx_files]
+            for future in asyncio.as_completed(futures):
+                result = await future
+                if result:
+                    yield result
+
+
+def _parse_one(raw_folder, processed_folder, filename):
+    """
+    Process a single .docx file in a worker process.
+    Top-level so it is pickled by reference; each worker builds its own importer.
+    """
+    return DocumentImporter(raw_folder, processed_folder).process_document(filename)
 
 
 if __name__ == '__main__':
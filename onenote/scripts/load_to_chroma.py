@@ -1,28 +1,33 @@
 """
 Load Embeddings to Chroma
-Loads existing embeddings from JSON files into Chroma vector database.
+Loads existing embeddings from .npz backups into Chroma vector database.
 Use this if you already have embeddings generated and want to populate Chroma.
+Also rebuilds the FAISS index used by the backend.
 """
 
-import json
 import chromadb
+import numpy as np
 from pathlib import Path
 from typing import List, Dict
+from build_faiss_index import build_faiss_index
 
 
 class ChromaLoader:
     def __init__(self, 
                  embeddings_folder='../embeddings',
-                 chroma_db_path='../../chroma_db'):
+                 chroma_db_path='../../chroma_db',
+                 faiss_index_path='../../faiss_index'):
         """
         Initialize the Chroma loader.
         
         Args:
-            embeddings_folder: Path to embeddings JSON files
+            embeddings_folder: Path to embeddings .npz files
             chroma_db_path: Path to Chroma database
+            faiss_index_path: Path to write the FAISS index used by the backend
         """
         self.embeddings_folder = Path(__file__).parent / embeddings_folder
         self.chroma_db_path = Path(__file__).parent / chroma_db_path
+        self.faiss_index_path = Path(__file__).parent / faiss_index_path
         
         # Initialize Chroma client
         self.chroma_client = chromadb.PersistentClient(path=str(self.chroma_db_path))
@@ -31,43 +36,52 @@ class ChromaLoader:
             metadata={"description": "OneNote document chunks with embeddings"}
         )
     
-    def load_embeddings_file(self, json_filename: str):
+    def load_embeddings_file(self, npz_filename: str):
         """
-        Load embeddings from a single JSON file into Chroma.
+        Load embeddings from a single .npz backup into Chroma.
         
         Args:
-            json_filename: Name of the embeddings JSON file
+            npz_filename: Name of the embeddings .npz file
         """
-        json_path = self.embeddings_folder / json_filename
+        npz_path = self.embeddings_folder / npz_filename
         
-        if not json_path.exists():
-            print(f"Error: File {json_filename} not found")
+        if not npz_path.exists():
+            print(f"Error: File {npz_filename} not found")
             return
         
-        print(f"Loading: {json_filename}")
+        print(f"Loading: {npz_filename}")
         
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Texts and metadata are stored as object arrays, which requires pickle
+        data = np.load(npz_path, allow_pickle=True)
         
-        chunks = data['chunks']
-        source_document = data['source_document']
+        # Vectors are stored as float16; Chroma works in float32
+        vectors = data['vecs'].astype(np.float32)
+        chunks = [
+            {**meta, 'text': text, 'embedding': vector}
+            for meta, text, vector in zip(data['meta'], data['texts'], vectors.tolist())
+        ]
+        source_document = str(data['source_document'])
+        
+        # Create unique IDs
+        candidate_ids = [
+            f"{source_document}_{chunk.get('section_idx', 0)}_{chunk.get('chunk_num', idx)}"
+            for idx, chunk in enumerate(chunks)
+        ]
+        
+        # Check which already exist in a single query (avoid duplicates)
+        try:
+            existing_ids = set(self.collection.get(ids=candidate_ids, include=[])['ids'])
+        except:
+            existing_ids = set()
         
         ids = []
         embeddings = []
         documents = []
         metadatas = []
         
-        for idx, chunk in enumerate(chunks):
-            # Create unique ID
-            chunk_id = f"{source_document}_{chunk.get('section_idx', 0)}_{chunk.get('chunk_num', idx)}"
-            
-            # Check if already exists (avoid duplicates)
-            try:
-                existing = self.collection.get(ids=[chunk_id])
-                if existing['ids']:
-                    continue  # Skip if already exists
-            except:
-                pass
+        for idx, (chunk_id, chunk) in enumerate(zip(candidate_ids, chunks)):
+            if chunk_id in existing_ids:
+                continue  # Skip if already exists
             
             ids.append(chunk_id)
             embeddings.append(chunk['embedding'])
@@ -80,7 +94,7 @@ class ChromaLoader:
                 'heading_level': chunk.get('heading_level', 0),
                 'section_idx': chunk.get('section_idx', 0),
                 'chunk_num': chunk.get('chunk_num', idx),
-                'word_count': chunk.get('word_count', 0),
+                'token_count': chunk.get('token_count', 0),
                 'embedding_model': chunk.get('embedding_model', 'unknown')
             }
             metadatas.append(metadata)
@@ -99,9 +113,9 @@ class ChromaLoader:
     
     def load_all_embeddings(self):
         """
-        Load all embeddings JSON files into Chroma.
+        Load all embeddings .npz files into Chroma.
         """
-        embeddings_files = list(self.embeddings_folder.glob('*_embeddings.json'))
+        embeddings_files = list(self.embeddings_folder.glob('*_embeddings.npz'))
         
         if not embeddings_files:
             print(f"No embeddings files found in {self.embeddings_folder}")
@@ -118,6 +132,9 @@ class ChromaLoader:
         # Get collection stats
         count = self.collection.count()
         print(f"\n✓ Chroma database now contains {count} chunks")
+        
+        # Rebuild the backend's FAISS index over the whole collection
+        build_faiss_index(self.collection, self.faiss_index_path)
     
     def get_collection_stats(self):
         """
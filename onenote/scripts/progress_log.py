@@ -0,0 +1,77 @@
+"""
+Progress Log
+Append-only record of the documents whose embeddings have been stored.
+If the embed step fails part way, the next run skips the documents that
+were already stored instead of starting over. The log is cleared once a
+run completes.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Dict
+
+import orjson
+
+
+class ProgressLog:
+    def __init__(self, log_path='../cache/progress.jsonl'):
+        """
+        Initialize the progress log and read the entries left by an interrupted run.
+
+        Args:
+            log_path: Path to the JSON Lines progress file
+        """
+        self.log_path = Path(__file__).parent / log_path
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.completed = set()
+        if self.log_path.exists():
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        self.completed.add(orjson.loads(line)['key'])
+                    except (orjson.JSONDecodeError, KeyError):
+                        # Line cut short by the crash that interrupted the run, that's okay
+                        pass
+
+    @staticmethod
+    def key(chunks_filename: str, chunks: List[Dict]) -> str:
+        """
+        Build the progress key for a chunks file. The chunk texts are part of
+        the key so a document that was edited since the interrupted run is
+        embedded again.
+        """
+        digest = hashlib.sha256()
+        for chunk in chunks:
+            digest.update(chunk['text'].encode())
+            digest.update(b'\0')
+        return f"{chunks_filename}:{digest.hexdigest()}"
+
+    def is_done(self, key: str) -> bool:
+        """
+        Check whether a document was stored by a previous, interrupted run.
+        """
+        return key in self.completed
+
+    def mark_done(self, key: str, num_chunks: int):
+        """
+        Record that a document's embeddings have been stored. The entry is
+        flushed to disk before returning, so it survives a crash right after.
+
+        Args:
+            key: Progress key of the document
+            num_chunks: Number of chunks stored for the document
+        """
+        with open(self.log_path, 'ab') as f:
+            f.write(orjson.dumps({'key': key, 'chunks': num_chunks}) + b'\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.completed.add(key)
+
+    def clear(self):
+        """
+        Remove the progress log after a run has completed.
+        """
+        self.log_path.unlink(missing_ok=True)
+        self.completed.clear()
@@ -7,30 +7,100 @@ import asyncio
 import sys
 from pathlib import Path
 
+try:
+    # libuv-based event loop; lowers per-callback overhead while many embedding
+    # requests are in flight. Not available on Windows, that's okay.
+    import uvloop
+    uvloop.install()
+except ImportError:
+    pass
+
 # Add scripts to path
 sys.path.append(str(Path(__file__).parent))
 
-from import_docs import DocumentImporter
-from chunk_text import TextChunker
-from generate_embeddings import EmbeddingGenerator
+# The step modules are imported inside the functions that use them, so a
+# single-step command only loads what that step needs (e.g. `import` never
+# loads openai or chromadb)
+
+# Bounded buffers between pipeline stages
+STAGE_QUEUE_SIZE = 64
+
+BANNER_RULE = "=" * 60
+BANNER_TITLE = "OneNote Document Processing Pipeline"
+BANNER_DONE = "✓ Pipeline completed successfully!"
 
 
 async def run_full_pipeline():
     """
     Run the complete pipeline: import → chunk → embed
+    
+    The three steps run concurrently as a streaming pipeline connected by
+    queues: documents are chunked as soon as they are parsed, and chunks are
+    embedded while later documents are still being parsed.
     """
-    print("=" * 60)
-    print("OneNote Document Processing Pipeline")
-    print("=" * 60)
-    print()
+    from import_docs import DocumentImporter
+    from chunk_text import TextChunker
+    from generate_embeddings import EmbeddingGenerator, MAX_BATCH_TOKENS
+    
+    print(BANNER_RULE)
+    print(BANNER_TITLE)
+    print(BANNER_RULE)
+    print("")
     
-    # Step 1: Import documents
-    print("STEP 1: Importing documents from .docx files")
-    print("-" * 60)
     importer = DocumentImporter()
-    docs = importer.process_all_documents()
+    chunker = TextChunker(chunk_size=400, overlap=40)
+    generator = EmbeddingGenerator()
+    
+    docs_queue = asyncio.Queue(maxsize=STAGE_QUEUE_SIZE)
+    chunks_queue = asyncio.Queue(maxsize=STAGE_QUEUE_SIZE)
+    stats = {'docs': 0, 'chunks': 0}
+    
+    async def import_stage():
+        # Step 1: Import documents
+        async for doc in importer.stream():
+            await docs_queue.put(doc)
+        await docs_queue.put(None)  # End of stream
     
-    if not docs:
+    async def chunk_stage():
+        # Step 2: Chunk texts
+        while (doc := await docs_queue.get()) is not None:
+            chunks_file = await asyncio.to_thread(chunker.chunk_document, doc)
+            stats['docs'] += 1
+            stats['chunks'] += len(chunks_file[1]['chunks'])
+            await chunks_queue.put(chunks_file)
+        await chunks_queue.put(None)  # End of stream
+    
+    async def embed_stage():
+        # Step 3: Generate embeddings. Documents are sent once their chunks
+        # would fill one request's token budget; the next group is collected
+        # while the previous one is being embedded and stored.
+        pending = []
+        pending_tokens = 0
+        in_flight = None
+        
+        async def flush():
+            nonlocal pending, pending_tokens, in_flight
+            if in_flight is not None:
+                await in_flight
+            in_flight = asyncio.create_task(generator.embed_documents(pending))
+            pending = []
+            pending_tokens = 0
+        
+        while (item := await chunks_queue.get()) is not None:
+            tokens = sum(chunk['token_count'] for chunk in item[1]['chunks'])
+            if pending and pending_tokens + tokens > MAX_BATCH_TOKENS:
+                await flush()
+            pending.append(item)
+            pending_tokens += tokens
+        
+        if pending:
+            await flush()
+        if in_flight is not None:
+            await in_flight
+    
+    await asyncio.gather(import_stage(), chunk_stage(), embed_stage())
+    
+    if not stats['docs']:
         print("\nPipeline stopped: No documents to process")
         print("\nNext steps:")
         print("1. Export your OneNote notebooks as .docx files")
@@ -38,33 +108,21 @@ async def run_full_pipeline():
         print("3. Run this script again")
         return
     
-    print("\n")
-    
-    # Step 2: Chunk texts
-    print("STEP 2: Chunking documents into smaller pieces")
-    print("-" * 60)
-    chunker = TextChunker(chunk_size=500, overlap=50)
-    chunks = chunker.process_all_documents()
+    generator.build_index()
     
     print("\n")
-    
-    # Step 3: Generate embeddings
-    print("STEP 3: Generating embeddings with OpenAI")
-    print("-" * 60)
-    generator = EmbeddingGenerator()
-    await generator.process_all_chunks()
-    
-    print("\n")
-    print("=" * 60)
-    print("✓ Pipeline completed successfully!")
-    print("=" * 60)
-    print(f"\nProcessed: {len(docs)} document(s)")
-    print(f"Created: {len(chunks)} chunk(s)")
+    print(BANNER_RULE)
+    print(BANNER_DONE)
+    print(BANNER_RULE)
+    print(f"\nProcessed: {stats['docs']} document(s)")
+    print(f"Created: {stats['chunks']} chunk(s)")
     print("\nYour embeddings are ready for vector database storage!")
 
 
 def run_import_only():
     """Run only the import step."""
+    from import_docs import DocumentImporter
+    
     print("Running: Document Import")
     importer = DocumentImporter()
     importer.process_all_documents()
@@ -72,37 +130,42 @@ def run_import_only():
 
 def run_chunk_only():
     """Run only the chunking step."""
+    from chunk_text import TextChunker
+    
     print("Running: Text Chunking")
-    chunker = TextChunker(chunk_size=500, overlap=50)
+    chunker = TextChunker(chunk_size=400, overlap=40)
     chunker.process_all_documents()
 
 
 async def run_embed_only():
     """Run only the embedding step."""
+    from generate_embeddings import EmbeddingGenerator
+    
     print("Running: Embedding Generation")
     generator = EmbeddingGenerator()
     await generator.process_all_chunks()
 
 
+def print_usage(command):
+    """Report an unknown command and list the available ones."""
+    print(f"Unknown command: {command}")
+    print("\nAvailable commands:")
+    print("  python run_pipeline.py         - Run full pipeline")
+    print("  python run_pipeline.py import  - Import documents only")
+    print("  python run_pipeline.py chunk   - Chunk documents only")
+    print("  python run_pipeline.py embed   - Generate embeddings only")
+
+
+# Command line argument → step to run (no argument runs the full pipeline)
+DISPATCH = {
+    None: lambda: asyncio.run(run_full_pipeline()),
+    'import': run_import_only,
+    'chunk': run_chunk_only,
+    'embed': lambda: asyncio.run(run_embed_only()),
+}
+
+
 if __name__ == '__main__':
-    import sys
+    command = sys.argv[1] if len(sys.argv) > 1 else None
     
-    if len(sys.argv) > 1:
-        command = sys.argv[1]
-        
-        if command == 'import':
-            run_import_only()
-        elif command == 'chunk':
-            run_chunk_only()
-        elif command == 'embed':
-            asyncio.run(run_embed_only())
-        else:
-            print(f"Unknown command: {command}")
-            print("\nAvailable commands:")
-            print("  python run_pipeline.py         - Run full pipeline")
-            print("  python run_pipeline.py import  - Import documents only")
-            print("  python run_pipeline.py chunk   - Chunk documents only")
-            print("  python run_pipeline.py embed   - Generate embeddings only")
-    else:
-        # Run full pipeline
-        asyncio.run(run_full_pipeline())
+    DISPATCH.get(command, lambda: print_usage(command))()
@@ -0,0 +1,37 @@
+"""
+Checks for the column-oriented chunk table in chunk_table.py.
+Run with: python -m pytest onenote/tests
+"""
+
+import sys
+from pathlib import Path
+
+# Make the scripts importable
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+
+from chunk_table import ChunkTable, UNKNOWN_TOKEN_COUNT
+
+
+def test_document_bounds_with_zero_chunk_documents():
+    documents = [
+        [],
+        [{'text': 'a', 'token_count': 1}, {'text': 'b', 'token_count': 2}],
+        [],
+        [{'text': 'c'}],
+        [],
+    ]
+
+    table = ChunkTable.from_documents(documents, estimated_n=1)
+    bounds = table.document_bounds(len(documents))
+
+    assert bounds.tolist() == [0, 0, 2, 2, 3, 3]
+    assert table.text.tolist() == ['a', 'b', 'c']
+    assert table.doc_id.tolist() == [1, 1, 3]
+    assert table.token_count.tolist() == [1, 2, UNKNOWN_TOKEN_COUNT]
+
+
+def test_document_bounds_of_empty_table():
+    table = ChunkTable.from_documents([[], []])
+
+    assert len(table) == 0
+    assert table.document_bounds(2).tolist() == [0, 0, 0]
@@ -0,0 +1,40 @@
+"""
+Checks for the SQLite embedding cache in embedding_cache.py.
+Run with: python -m pytest onenote/tests
+"""
+
+import sys
+from pathlib import Path
+
+# Make the scripts importable
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+
+from embedding_cache import EmbeddingCache, MAX_QUERY_PARAMS
+
+
+def test_get_many_round_trip(tmp_path):
+    cache = EmbeddingCache(cache_path=tmp_path / 'embeddings.sqlite')
+    cache.put_many(['a', 'b'], [[1.0, 2.0], [3.0, 4.0]])
+
+    assert cache.get_many(['a', 'b', 'missing']) == {'a': [1.0, 2.0], 'b': [3.0, 4.0]}
+    assert cache.get_many([]) == {}
+
+
+def test_get_many_ignores_expired_rows(tmp_path):
+    cache = EmbeddingCache(cache_path=tmp_path / 'embeddings.sqlite', ttl_seconds=60)
+    cache.put_many(['old', 'new'], [[1.0], [2.0]])
+    with cache.conn:
+        cache.conn.execute("UPDATE embed_cache SET created_at = created_at - 3600 WHERE key = 'old'")
+
+    assert cache.get_many(['old', 'new']) == {'new': [2.0]}
+
+
+def test_get_many_more_keys_than_query_params(tmp_path):
+    cache = EmbeddingCache(cache_path=tmp_path / 'embeddings.sqlite')
+    keys = [f"key{i}" for i in range(2 * MAX_QUERY_PARAMS + 7)]
+    cache.put_many(keys, [[float(i)] for i in range(len(keys))])
+
+    cached = cache.get_many(keys + ['missing'])
+
+    assert len(cached) == len(keys)
+    assert cached[keys[-1]] == [float(len(keys) - 1)]
@@ -0,0 +1,131 @@
+"""
+Checks for the request packing and resumable embed step in generate_embeddings.py.
+Run with: python -m pytest onenote/tests
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Make the scripts importable
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+
+import generate_embeddings
+from embedding_cache import EmbeddingCache
+from generate_embeddings import EmbeddingGenerator, pack_batches
+from progress_log import ProgressLog
+
+
+def _check_batches(batches, keys, token_counts):
+    assert sorted(key for batch in batches for key in batch) == sorted(keys)
+    for batch in batches:
+        assert len(batch) <= generate_embeddings.MAX_BATCH_INPUTS
+        # Only a text that alone exceeds the budget gets a batch over it
+        assert len(batch) == 1 or sum(token_counts[key] for key in batch) < generate_embeddings.MAX_BATCH_TOKENS
+
+
+def test_pack_batches_respects_token_budget(monkeypatch):
+    monkeypatch.setattr(generate_embeddings, 'MAX_BATCH_TOKENS', 100)
+    token_counts = {f"k{i}": tokens for i, tokens in enumerate([60, 50, 40, 30, 20, 10, 5])}
+
+    batches = pack_batches(list(token_counts), token_counts)
+
+    _check_batches(batches, list(token_counts), token_counts)
+    assert len(batches) == 3
+
+
+def test_pack_batches_respects_input_limit(monkeypatch):
+    monkeypatch.setattr(generate_embeddings, 'MAX_BATCH_INPUTS', 4)
+    token_counts = {f"k{i}": 1 for i in range(10)}
+
+    batches = pack_batches(list(token_counts), token_counts)
+
+    _check_batches(batches, list(token_counts), token_counts)
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+
+
+def test_pack_batches_text_over_budget_gets_own_batch(monkeypatch):
+    monkeypatch.setattr(generate_embeddings, 'MAX_BATCH_TOKENS', 100)
+    token_counts = {'huge': 250, 'small': 10, 'tiny': 5}
+
+    batches = pack_batches(list(token_counts), token_counts)
+
+    _check_batches(batches, list(token_counts), token_counts)
+    assert batches == [['huge'], ['small', 'tiny']]
+
+
+class FakeEmbeddings:
+    """Stands in for client.embeddings; fails the request numbered fail_on."""
+
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+        self.inputs = []
+
+    async def create(self, model, input):
+        self.inputs.append(list(input))
+        if len(self.inputs) == self.fail_on:
+            raise RuntimeError("run killed")
+        return SimpleNamespace(data=[
+            SimpleNamespace(index=i, embedding=[float(len(text)), 1.0, 0.0])
+            for i, text in enumerate(input)
+        ])
+
+
+def _chunks_data(name, texts, tokens):
+    return {
+        'source_document': f"{name}.docx",
+        'chunks': [
+            {'text': text, 'token_count': tokens, 'chunk_id': i, 'heading': name}
+            for i, text in enumerate(texts)
+        ],
+    }
+
+
+def _generator(tmp_path, embeddings):
+    generator = EmbeddingGenerator(
+        processed_folder=tmp_path / 'processed',
+        embeddings_folder=tmp_path / 'embeddings',
+        chroma_db_path=tmp_path / 'chroma_db',
+        faiss_index_path=tmp_path / 'faiss_index',
+        cache=EmbeddingCache(cache_path=tmp_path / 'cache' / 'embeddings.sqlite'),
+        progress=ProgressLog(log_path=tmp_path / 'cache' / 'progress.jsonl'),
+    )
+    generator.client = SimpleNamespace(embeddings=embeddings)
+    return generator
+
+
+def test_rerun_skips_documents_stored_before_the_failure(tmp_path, monkeypatch):
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    # One chunk per request, one request at a time
+    monkeypatch.setattr(generate_embeddings, 'MAX_BATCH_TOKENS', 150)
+    monkeypatch.setattr(generate_embeddings, 'MAX_CONCURRENT_REQUESTS', 1)
+
+    documents = [
+        ('a_chunks.json', _chunks_data('a', ['a one', 'a two'], 100)),
+        ('b_chunks.json', _chunks_data('b', ['b one', 'b two'], 90)),
+    ]
+
+    # The first run dies on the request for document b's first chunk
+    generator = _generator(tmp_path, FakeEmbeddings(fail_on=3))
+    with pytest.raises(RuntimeError):
+        asyncio.run(generator.embed_documents(documents))
+    assert (tmp_path / 'embeddings' / 'a_chunks_embeddings.npz').exists()
+    assert not (tmp_path / 'embeddings' / 'b_chunks_embeddings.npz').exists()
+
+    # The rerun only embeds and stores document b (a batch that finished
+    # after the failure may already be cached)
+    embeddings = FakeEmbeddings()
+    generator = _generator(tmp_path, embeddings)
+    stored = []
+    save_embeddings = generator._save_embeddings
+    monkeypatch.setattr(generator, '_save_embeddings',
+                        lambda name, data, vecs: (stored.append(name), save_embeddings(name, data, vecs)))
+    asyncio.run(generator.embed_documents(documents))
+
+    assert stored == ['b_chunks.json']
+    assert 'b one' in sum(embeddings.inputs, [])
+    assert not {'a one', 'a two'} & set(sum(embeddings.inputs, []))
+    assert generator.collection.count() == 4
@@ -0,0 +1,139 @@
+"""
+Regression checks for the .docx text extraction in import_docs.py.
+Run with: python -m pytest onenote/tests
+"""
+
+import sys
+from pathlib import Path
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_BREAK
+from docx.oxml.ns import qn
+
+# Make the scripts importable
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+
+from import_docs import DocumentImporter, _iter_body_paragraphs
+
+
+def test_breaks_and_tabs_match_python_docx(tmp_path):
+    docx_path = tmp_path / 'notes.docx'
+
+    doc = Document()
+    doc.add_heading('Heading', 1)
+    paragraph = doc.add_paragraph('line one')
+    paragraph.runs[0].add_break()
+    paragraph.add_run('line two')
+    paragraph = doc.add_paragraph('tab')
+    paragraph.runs[0].add_tab()
+    paragraph.add_run('here')
+    paragraph = doc.add_paragraph('before page break')
+    paragraph.runs[0].add_break(WD_BREAK.PAGE)
+    paragraph.add_run(' after')
+    doc.add_paragraph('mixed\ttext\nin one run')
+    doc.save(docx_path)
+
+    expected = [p.text.strip() for p in Document(docx_path).paragraphs]
+    texts = [text for text, _ in _iter_body_paragraphs(docx_path)]
+
+    assert texts == expected
+    assert 'line one\nline two' in texts
+    assert 'tab\there' in texts
+
+
+def _python_docx_sections(docx_path):
+    """Sections as the original python-docx based importer built them."""
+    sections = []
+    current = {'heading': 'Introduction', 'level': 0, 'content': []}
+    for para in Document(docx_path).paragraphs:
+        text = para.text.strip()
+        if not text:
+            continue
+        if para.style.name.startswith('Heading'):
+            if current['content']:
+                sections.append(current)
+            level = int(para.style.name.replace('Heading ', '')) if para.style.name != 'Heading' else 1
+            current = {'heading': text, 'level': level, 'content': []}
+        else:
+            current['content'].append(text)
+    if current['content']:
+        sections.append(current)
+    return [(s['heading'], s['level'], '\n'.join(s['content'])) for s in sections]
+
+
+def test_sections_match_python_docx(tmp_path):
+    docx_path = tmp_path / 'notes.docx'
+
+    doc = Document()
+    doc.add_paragraph('intro')
+    doc.add_heading('First', 1)
+    paragraph = doc.add_paragraph('soft')
+    paragraph.runs[0].add_break()
+    paragraph.add_run('break')
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = 'in a table'
+    doc.add_paragraph('key:\tvalue')
+    doc.add_heading('Second', 2)
+    doc.add_paragraph('a\nb\tc')
+    doc.save(docx_path)
+
+    importer = DocumentImporter(raw_folder=tmp_path / 'raw', processed_folder=tmp_path / 'processed')
+    sections = importer.extract_text_from_docx(docx_path)
+
+    assert [(s['heading'], s['level'], s['text']) for s in sections] == _python_docx_sections(docx_path)
+
+
+def _localize_style_id(doc, style_name, style_id):
+    """Give a style the id a localized Word uses, keeping its name."""
+    style = doc.styles[style_name]
+    old_id = style.style_id
+    style.element.set(qn('w:styleId'), style_id)
+    for based_on in doc.styles.element.iter(qn('w:basedOn')):
+        if based_on.get(qn('w:val')) == old_id:
+            based_on.set(qn('w:val'), style_id)
+    for p_style in doc.element.body.iter(qn('w:pStyle')):
+        if p_style.get(qn('w:val')) == old_id:
+            p_style.set(qn('w:val'), style_id)
+
+
+def test_localized_heading_styles(tmp_path):
+    docx_path = tmp_path / 'notes.docx'
+
+    doc = Document()
+    doc.add_paragraph('intro')
+    doc.add_heading('Erstes Kapitel', 1)
+    doc.add_paragraph('text one')
+    doc.add_heading('Unterkapitel', 2)
+    doc.add_paragraph('text two')
+    # Localized Word keeps the built-in names ('heading 1') but not the ids
+    _localize_style_id(doc, 'Heading 1', 'berschrift1')
+    _localize_style_id(doc, 'Heading 2', 'berschrift2')
+    doc.save(docx_path)
+
+    importer = DocumentImporter(raw_folder=tmp_path / 'raw', processed_folder=tmp_path / 'processed')
+    sections = importer.extract_text_from_docx(docx_path)
+
+    assert [(s['heading'], s['level'], s['text']) for s in sections] == _python_docx_sections(docx_path)
+    assert [s['heading'] for s in sections] == ['Introduction', 'Erstes Kapitel', 'Unterkapitel']
+
+
+def test_custom_style_based_on_heading(tmp_path):
+    docx_path = tmp_path / 'notes.docx'
+
+    doc = Document()
+    custom = doc.styles.add_style('Meine Überschrift', WD_STYLE_TYPE.PARAGRAPH)
+    custom.base_style = doc.styles['Heading 2']
+    doc.add_paragraph('intro')
+    doc.add_paragraph('Eigener Abschnitt', style=custom)
+    doc.add_paragraph('body')
+    _localize_style_id(doc, 'Heading 2', 'berschrift2')
+    doc.save(docx_path)
+
+    importer = DocumentImporter(raw_folder=tmp_path / 'raw', processed_folder=tmp_path / 'processed')
+    sections = importer.extract_text_from_docx(docx_path)
+
+    assert [(s['heading'], s['level'], s['text']) for s in sections] == [
+        ('Introduction', 0, 'intro'),
+        ('Eigener Abschnitt', 2, 'body'),
+    ]
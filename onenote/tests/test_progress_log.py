@@ -0,0 +1,40 @@
+"""
+Checks for the resume log in progress_log.py.
+Run with: python -m pytest onenote/tests
+"""
+
+import sys
+from pathlib import Path
+
+# Make the scripts importable
+sys.path.append(str(Path(__file__).parent.parent / 'scripts'))
+
+from progress_log import ProgressLog
+
+
+def test_round_trip_and_clear(tmp_path):
+    log_path = tmp_path / 'progress.jsonl'
+    chunks = [{'text': 'one'}, {'text': 'two'}]
+    key = ProgressLog.key('notes_chunks.json', chunks)
+
+    log = ProgressLog(log_path=log_path)
+    assert not log.is_done(key)
+    log.mark_done(key, len(chunks))
+
+    # A new run reads the entries back, ignoring a line cut short by a crash
+    with open(log_path, 'ab') as f:
+        f.write(b'{"key": "cut')
+    assert ProgressLog(log_path=log_path).is_done(key)
+
+    log.clear()
+    assert not log.is_done(key)
+    assert not log_path.exists()
+    assert not ProgressLog(log_path=log_path).is_done(key)
+
+
+def test_key_changes_with_chunk_text():
+    chunks = [{'text': 'one'}, {'text': 'two'}]
+    edited = [{'text': 'one'}, {'text': 'two!'}]
+
+    assert ProgressLog.key('notes_chunks.json', chunks) == ProgressLog.key('notes_chunks.json', chunks)
+    assert ProgressLog.key('notes_chunks.json', chunks) != ProgressLog.key('notes_chunks.json', edited)